@@ -1,22 +1,10 @@
 import matplotlib.pyplot as plt
 import numpy as np
 from CC_transverse_kick import *
+from plottingTools import set_plot_style
 
 # Plotting parameters
-params = {'legend.fontsize': 20,
-          'figure.figsize': (9.5, 8.5),
-          'axes.labelsize': 27,
-          'axes.titlesize': 23,
-          'xtick.labelsize': 27,
-          'ytick.labelsize': 27,
-          'image.cmap': 'jet',
-          'lines.linewidth': 2,
-          'lines.markersize': 5,
-          'font.family': 'sans-serif'}
-
-plt.rc('text', usetex=False)
-plt.rc('font', family='serif')
-plt.rcParams.update(params)
+set_plot_style()
 
 initial_sigmas = np.linspace(-0.155 * 3, 0.155 * 3, 100)  # m
 
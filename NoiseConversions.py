@@ -1,3 +1,5 @@
+from collections import namedtuple
+
 import numpy as np
 
 def ssb_2_dsb(L):
@@ -8,10 +10,78 @@ def ssb_2_dsb(L):
     IMPORTANT: In the definitions here, both L(f) and S(f) are one sided, ie only positive frequencies.
     """
 
-    S = 2*10**(L/10)
+    S = 2*10**(np.asarray(L)/10)
     return S
 
 def dsb_2_ssb(S):
-    L_10 = np.log10(S/2)
+    L_10 = np.log10(np.asarray(S)/2)
     L = L_10*10
     return L
+
+def sixtracklib2standardUnits(A, Eb, Vcc, frev):
+    # convert the rms noise as applied in Sixtracklib, A, to the one-sided PSD in rad^2/Hz or V^2/Hz
+    # of white noise, variance = PSD*frev/2. Eb in eV, Vcc in V and frev in Hz
+    scaling_factor = np.asarray(Eb)/Vcc # scaling factor to rms noise, σ
+    PSD = 2*(np.asarray(A)*scaling_factor)**2/frev
+    return PSD
+
+def standardUnits2sixtracklib(PSD, Eb, Vcc, frev):
+    # convert the one-sided PSD of white noise in rad^2/Hz or V^2/Hz to the rms noise as applied in
+    # Sixtracklib, A, with variance = PSD*frev/2. Eb in eV, Vcc in V and frev in Hz
+    scaling_factor = np.asarray(Vcc)/Eb # scaling factor to rms noise, σ
+    A = np.sqrt(np.asarray(PSD)*frev/2)*scaling_factor
+    return A
+
+
+# An array of noise specifications together with its unit, one of noise_units.
+# The unit is stored once for the whole array.
+NoiseSpec = namedtuple('NoiseSpec', ['values', 'unit'])
+
+noise_units = ('dBc/Hz', 'rad^2/Hz', 'rms_kick')
+
+
+def convert_noise(values, from_unit, to_unit, Eb=None, Vcc=None, frev=None):
+    """
+    Convert an array of noise specifications between the units:
+    - 'dBc/Hz': single sideband measurement L(f)
+    - 'rad^2/Hz': double sideband density S(f) (or V^2/Hz for amplitude noise), one-sided as in ssb_2_dsb
+    - 'rms_kick': rms noise kick per turn as applied in the tracking (Sixtracklib), for white noise of
+      one-sided PSD S over [0, frev/2]: A = sqrt(S*frev/2)*Vcc/Eb, as in create_noise_kicks_from_psd
+    Eb in eV, Vcc in V and frev in Hz are only needed to convert from or to 'rms_kick'.
+    All arguments are broadcast against each other, e.g. values of shape (n,) with Eb of shape (m, 1)
+    return an (m, n) array in a single call.
+    """
+    for unit in (from_unit, to_unit):
+        if unit not in noise_units:
+            raise ValueError('Unknown noise unit {!r}, expected one of {}'.format(unit, noise_units))
+    if 'rms_kick' in (from_unit, to_unit) and from_unit != to_unit and any(x is None for x in (Eb, Vcc, frev)):
+        raise ValueError('Eb, Vcc and frev are needed to convert from {} to {}'.format(from_unit, to_unit))
+
+    values = np.asarray(values, dtype=float)
+    if from_unit == to_unit:
+        return values
+    # everything goes through rad^2/Hz
+    if from_unit == 'dBc/Hz':
+        PSD = ssb_2_dsb(values)
+    elif from_unit == 'rms_kick':
+        PSD = sixtracklib2standardUnits(values, Eb, Vcc, frev)
+    else:
+        PSD = values
+
+    if to_unit == 'dBc/Hz':
+        return dsb_2_ssb(PSD)
+    elif to_unit == 'rms_kick':
+        return standardUnits2sixtracklib(PSD, Eb, Vcc, frev)
+    return PSD
+
+
+def specs_to_rms_kicks(specs, Eb, Vcc, frev):
+    """
+    Convert a sequence of NoiseSpec, each array with its own unit, to rms kick amplitudes per turn.
+    The arrays are flattened and concatenated along the last axis, and Eb, Vcc and frev broadcast
+    against them as in convert_noise, e.g. Eb of shape (m, 1) returns an (m, n_total) array.
+    """
+    kicks = [convert_noise(np.ravel(spec.values), spec.unit, 'rms_kick', Eb, Vcc, frev) for spec in specs]
+    # specifications already given as rms kicks do not depend on Eb, Vcc and frev
+    leading_shape = np.broadcast_shapes(*[np.shape(kick)[:-1] for kick in kicks])
+    return np.concatenate([np.broadcast_to(kick, leading_shape + kick.shape[-1:]) for kick in kicks], axis=-1)
@@ -0,0 +1,146 @@
+'''
+Batch processing of the measured phase noise spectra of an MD campaign.
+
+For every spectrum file (e.g. coast3EX-10DBm.csv, L(f) in dBc/Hz) found in a directory:
+1) load it and convert it to S(f) in rad^2/Hz with ssb_2_dsb,
+2) integrate the noise power over the full measured range and over the requested bands,
+3) read the PSD at the first betatron sidebands (k +- Qy)*frev,
+4) predict the emittance growth rate summing all the sidebands (emit_growth_from_measured_psd).
+
+The files are processed in parallel in a process pool and the results are written to one columnar
+summary file (.npz, one array per column). Files whose modification time and size did not change since
+the previous run, with the same parameters, are not processed again.
+
+Example:
+python batchSpectraRunner.py MD_spectra/ -o summary.npz --Qy 26.18 --sigma 1.7 --sigma-unit ns --band 0 10e3
+'''
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bunchLengthConversions import bunch_length_m_to_rad, bunch_length_to_m
+from cmptTheoreticalEmitGrowth import emit_growth_from_measured_psd, sideband_frequencies
+from measuredSpectra import load_psd, cumulative_psd, band_power, total_power
+
+clight = 299792458
+
+
+def band_column(f_lo, f_hi):
+    return 'power_{:g}Hz_{:g}Hz'.format(f_lo, f_hi)
+
+
+def sideband_columns(n_sidebands):
+    # names of the sidebands in the order of sideband_frequencies
+    return (['PSD_({}+Q)frev'.format(k) for k in range(n_sidebands)] +
+            ['PSD_({}-Q)frev'.format(k + 1) for k in range(n_sidebands)])
+
+
+def process_spectrum(path, params):
+    # return: dict with the results of one spectrum file
+    freq, S = load_psd(path)
+    cpsd = cumulative_psd(freq, S)
+
+    result = {'total_power': total_power(cpsd)}
+    bands = np.array(params['bands'], dtype=float).reshape(-1, 2)
+    for (f_lo, f_hi), power in zip(bands, band_power(cpsd, bands[:, 0], bands[:, 1])):
+        result[band_column(f_lo, f_hi)] = power
+
+    f_sb = sideband_frequencies(params['Qy'], params['frev'], params['n_sidebands_report'])[0]
+    PSD_sb = np.interp(f_sb, freq, S, left=0., right=0.)  # no power outside the measured range
+    result.update(zip(sideband_columns(params['n_sidebands_report']), PSD_sb))
+
+    sigma_z = bunch_length_to_m(params['sigma'], params['sigma_unit'], clight, params['f_cc'])
+    sigma_phi = bunch_length_m_to_rad(sigma_z, clight, params['f_cc'])
+    result['growth_rate_PN'] = emit_growth_from_measured_psd(freq, S, params['Qy'], params['frev'],
+                                                             params['betay'], params['Vcc'], params['Eb'],
+                                                             sigma_phi, noise_type='PN')[0, 0]
+    return result
+
+
+def load_summary(output, params):
+    # return: the rows of the previous summary, keyed by path, if it was computed with the same parameters
+    if not os.path.exists(output):
+        return {}
+    with np.load(output) as summary:
+        if str(summary['params']) != json.dumps(params, sort_keys=True) or 'path' not in summary.files:
+            return {}  # other parameters, or no row written
+        columns = [name for name in summary.files if name != 'params']
+        data = {name: summary[name] for name in columns}
+    return {os.path.abspath(data['path'][i]): {name: data[name][i] for name in columns}
+            for i in range(len(data['path']))}
+
+
+def write_summary(output, rows, params):
+    # write the rows, sorted by path, as one array per column
+    paths = sorted(rows)
+    columns = {name: np.array([rows[path][name] for path in paths]) for name in rows[paths[0]]} if paths else {}
+    tmp = output + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, params=json.dumps(params, sort_keys=True), **columns)
+    os.replace(tmp, output)
+
+
+def run(directory, output, params, pattern='*.csv', workers=None):
+    # the rows are keyed by absolute path, so that a run from another working directory finds them
+    files = sorted(os.path.abspath(path) for path in glob.glob(os.path.join(directory, pattern)))
+    previous = load_summary(output, params)
+
+    rows = {}
+    todo = []
+    for path in files:
+        stat = os.stat(path)
+        row = previous.get(path)
+        if row is not None and row['mtime'] == stat.st_mtime and row['size'] == stat.st_size:
+            rows[path] = row
+        else:
+            todo.append((path, stat))
+    print('{} spectra found, {} up to date, {} to process'.format(len(files), len(rows), len(todo)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(path, stat, pool.submit(process_spectrum, path, params)) for path, stat in todo]
+        for path, stat, future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                # not written to the summary, so it is retried in the next run
+                print('Failed to process {}: {}'.format(path, e), file=sys.stderr)
+                continue
+            rows[path] = dict(path=path, mtime=stat.st_mtime, size=stat.st_size, **result)
+
+    write_summary(output, rows, params)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batch processing of measured phase noise spectra')
+    parser.add_argument('directory', help='directory with the spectrum files')
+    parser.add_argument('-o', '--output', default='spectra_summary.npz', help='columnar summary file (.npz)')
+    parser.add_argument('--pattern', default='*.csv', help='pattern of the spectrum files')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes')
+    parser.add_argument('--Qy', type=float, default=26.18, help='vertical tune')
+    parser.add_argument('--frev', type=float, default=43.45e3, help='revolution frequency in Hz')
+    parser.add_argument('--betay', type=float, default=73.82, help='beta function at the CC in m')
+    parser.add_argument('--Vcc', type=float, default=1e6, help='CC voltage in V')
+    parser.add_argument('--Eb', type=float, default=270e9, help='beam energy in eV')
+    parser.add_argument('--f-cc', type=float, default=400e6, help='CC frequency in Hz')
+    parser.add_argument('--sigma', type=float, default=0.155, help='rms bunch length')
+    parser.add_argument('--sigma-unit', default='m', choices=['m', 'rad', 'ns'], help='unit of --sigma')
+    parser.add_argument('--band', type=float, nargs=2, action='append', metavar=('F_LO', 'F_HI'),
+                        help='band in Hz for the integrated power, can be repeated (default: 0 10e3)')
+    parser.add_argument('--n-sidebands', type=int, default=2,
+                        help='number of (k+Q) and (k-Q) sidebands with the PSD in the summary')
+    args = parser.parse_args(argv)
+
+    params = {'Qy': args.Qy, 'frev': args.frev, 'betay': args.betay, 'Vcc': args.Vcc, 'Eb': args.Eb,
+              'f_cc': args.f_cc, 'sigma': args.sigma, 'sigma_unit': args.sigma_unit,
+              'bands': args.band or [[0., 10e3]], 'n_sidebands_report': args.n_sidebands}
+    run(args.directory, args.output, params, args.pattern, args.workers)
+
+
+if __name__ == '__main__':
+    main()
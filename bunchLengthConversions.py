@@ -22,3 +22,16 @@ def bunch_length_time_to_m(sigma_t, clight):
     sigma_z = sigma_t*clight
     return sigma_z
 
+
+def bunch_length_to_m(sigma, unit, clight, f_RF=None):
+    # Arguments: sigma: bunch length in unit, 'm', 'rad' (at f_RF in Hz) or 'ns', clight: in m/s
+    # Return: the bunch length in m
+    if unit == 'm':
+        return sigma
+    elif unit == 'rad':
+        if f_RF is None:
+            raise ValueError('f_RF is needed to convert the bunch length from rad')
+        return bunch_length_rad_to_m(sigma, clight, f_RF)
+    elif unit == 'ns':
+        return bunch_length_time_to_m(sigma*1e-9, clight)
+    raise ValueError("Unknown bunch length unit {!r}, expected 'm', 'rad' or 'ns'".format(unit))
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+
+import numpy as np
+from scipy import fft as sp_fft
+
+from noiseGenerators import precision_dtypes
+
+
+def sum_periodograms(chunks, precision='double'):
+    # chunks: 2D array (n_chunks, n) of turn-by-turn signal pieces
+    # return: sum over the chunks of |rfft|^2, always accumulated in float64
+    real, _ = precision_dtypes(precision)
+    spectrum = sp_fft.rfft(np.asarray(chunks, dtype=real), axis=-1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    return power.sum(axis=0, dtype=np.float64)
+
+
+def periodograms_to_psd(periodogram_sum, n_chunks, n, frev, one_sided=True):
+    """
+    Normalise the sum of |rfft|^2 of n_chunks chunks of n turns to a PSD in rad^2/Hz or V^2/Hz.
+    The two-sided PSD is mean(|fft|^2)/(Df*n^2) with Df = frev/n. The one-sided PSD doubles all
+    components apart from DC and, for even n, the Nyquist frequency.
+    return: freq in Hz, PSD
+    """
+    Df = frev / n
+    PSD = periodogram_sum / (n_chunks * Df * n ** 2)
+    if one_sided:
+        PSD[..., 1:(n + 1) // 2] *= 2
+    freq = sp_fft.rfftfreq(n, 1 / frev)
+    return freq, PSD
+
+
+def chunk_view(y, n, step=None):
+    """
+    Strided view of a 1D signal (also a np.memmap) as windows of n turns, starting every step turns
+    (by default step=n, i.e. contiguous non overlapping chunks). No data is copied or read.
+    return: array of shape (n_chunks, n)
+    """
+    step = n if step is None else step
+    if len(y) < n:
+        raise ValueError('The signal ({} turns) is shorter than one chunk ({} turns)'.format(len(y), n))
+    return np.lib.stride_tricks.sliding_window_view(y, n)[::step]
+
+
+def averaged_psd(y, n, frev, precision='double', block_size=256, one_sided=True):
+    """
+    PSD of a turn-by-turn signal, y, averaged over chunks of n turns.
+    - frev: the revolution (sampling) frequency in Hz
+    - precision: 'double' or 'single'. With 'single' the FFTs run in float32/complex64,
+      while the sum of |fft|^2 over the chunks is kept in float64.
+    The signal is viewed as (len(y)//n, n) chunks without a copy, the remaining turns are dropped, and the
+    chunks are transformed block_size at a time.
+    return: freq in Hz, PSD in rad^2/Hz or V^2/Hz
+    """
+    chunks = chunk_view(np.asarray(y), n)
+    n_chunks = len(chunks)
+
+    periodogram_sum = np.zeros(n // 2 + 1)
+    for start in range(0, n_chunks, block_size):
+        periodogram_sum += sum_periodograms(chunks[start:start + block_size], precision)
+
+    return periodograms_to_psd(periodogram_sum, n_chunks, n, frev, one_sided)
+
+
+def _read_block(chunks, start, stop, real):
+    # load a block of chunks from disk into memory, in the precision of the FFT
+    return np.array(chunks[start:stop], dtype=real)
+
+
+def averaged_psd_from_file(path, n, frev, step=None, precision='double', block_turns=2**24, prefetch=2,
+                           one_sided=True):
+    """
+    Out-of-core version of averaged_psd for a signal stored in a .npy file, e.g. written by the tracking.
+    The file is memory mapped and viewed as windows of n turns every step turns (see chunk_view), so the
+    signal is never held in memory: only prefetch+1 blocks of about block_turns turns are (at least one
+    chunk per block), plus the rfft of the current block. A thread pool reads the next blocks from disk
+    while the FFT of the current block is computed. With the defaults, about 1 GB in double precision
+    whatever n, as long as n <= block_turns.
+    return: freq in Hz, PSD in rad^2/Hz or V^2/Hz
+    """
+    real, _ = precision_dtypes(precision)
+    if prefetch < 1:
+        raise ValueError('prefetch must be at least 1 block, got {}'.format(prefetch))
+    y = np.load(path, mmap_mode='r')
+    if y.ndim != 1:
+        raise ValueError('Expected a 1D signal in {}, got shape {}'.format(path, y.shape))
+    chunks = chunk_view(y, n, step)
+    n_chunks = len(chunks)
+    block_size = max(1, block_turns // n)  # chunks per block
+
+    periodogram_sum = np.zeros(n // 2 + 1)
+    starts = iter(range(0, n_chunks, block_size))
+    with ThreadPoolExecutor(max_workers=prefetch) as pool:
+        pending = deque()
+        for start in starts:
+            pending.append(pool.submit(_read_block, chunks, start, start + block_size, real))
+            if len(pending) == prefetch:
+                break
+        while pending:
+            block = pending.popleft().result()
+            start = next(starts, None)
+            if start is not None:
+                pending.append(pool.submit(_read_block, chunks, start, start + block_size, real))
+            periodogram_sum += sum_periodograms(block, precision)
+
+    return periodograms_to_psd(periodogram_sum, n_chunks, n, frev, one_sided)
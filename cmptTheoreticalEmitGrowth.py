@@ -1,6 +1,8 @@
 import numpy as np
 from scipy.special import iv
 
+from measuredSpectra import interpolation_weights
+
 
 def emit_growth_phase_noise(betay, Vcc, frev, Eb, CDeltaPhi, PSD_phi, one_sided_psd=False):
     # input: betay in m, Vcc in V, frev in Hz, PSD in rad^2/Hz
@@ -69,3 +71,62 @@ def cmpt_bunch_length_correction_factor(sigma_phi, noise_type):
     return C
 
 
+
+def sideband_frequencies(Qy, frev, n_sidebands):
+    '''
+    The betatron sidebands (k +- Qy)*frev seen by the one-sided PSD, i.e. only positive frequencies:
+    (k + q)*frev for k = 0, ..., n_sidebands-1 and (k - q)*frev for k = 1, ..., n_sidebands, with q the
+    fractional tune.
+    - Qy: scalar or array of tunes
+    return: array of shape (len(Qy), 2*n_sidebands) in Hz
+    '''
+    q = np.mod(np.atleast_1d(np.asarray(Qy, dtype=float)), 1)[:, np.newaxis]
+    k = np.arange(n_sidebands)
+    return np.concatenate([(k + q), (k + 1 - q)], axis=1) * frev
+
+
+def sideband_index_map(freq, Qy, frev, n_sidebands=None):
+    '''
+    Precompute the linear interpolation of a PSD sampled at freq on the betatron sidebands, so that the
+    same map is reused for all the measured spectra on that frequency grid.
+    - n_sidebands: by default enough to cover the measured range
+    Sidebands outside the measured range get zero weight, i.e. no noise power.
+    return: indices i and weights (w_i, w_i+1) such that PSD(sidebands) = w_i*psd[i] + w_i+1*psd[i+1]
+    '''
+    freq = np.asarray(freq, dtype=float)
+    if n_sidebands is None:
+        n_sidebands = int(np.ceil(freq[-1] / frev))
+    f_sb = sideband_frequencies(Qy, frev, n_sidebands)
+
+    i, w, inside = interpolation_weights(freq, f_sb)
+    return i, ((1 - w) * inside, w * inside)
+
+
+def sum_psd_over_sidebands(psd, index_map):
+    # psd: array of shape (..., len(freq)), e.g. (n_files, len(freq))
+    # return: the PSD summed over the sidebands, shape (..., len(Qy))
+    i, (w0, w1) = index_map
+    psd = np.asarray(psd, dtype=float)
+    return np.sum(psd[..., i] * w0 + psd[..., i + 1] * w1, axis=-1)
+
+
+def emit_growth_from_measured_psd(freq, psd, Qy, frev, betay, Vcc, Eb, sigma_phi, noise_type='PN',
+                                  n_sidebands=None, index_map=None):
+    '''
+    Emittance growth rate from the full measured one-sided PSD, in rad^2/Hz for phase noise (or V^2/Hz for
+    amplitude noise), summing the contributions of all the betatron sidebands (k +- Qy)*frev.
+    - freq: frequencies of the PSD in Hz, psd: shape (..., len(freq)) e.g. several files on the same grid
+    - Qy: array of tunes, sigma_phi: array of bunch lengths in rad at the CC frequency
+    - noise_type: 'PN' for phase noise, 'AN' for amplitude noise
+    - index_map: the output of sideband_index_map, to reuse it between calls
+    return: the geometric emittance growth rate in m/s with shape (..., len(Qy), len(sigma_phi))
+    '''
+    if index_map is None:
+        index_map = sideband_index_map(freq, Qy, frev, n_sidebands)
+    PSD_sum = sum_psd_over_sidebands(psd, index_map)[..., np.newaxis]
+    C = cmpt_bunch_length_correction_factor(np.atleast_1d(np.asarray(sigma_phi, dtype=float)), noise_type)
+
+    if noise_type == 'PN':
+        return emit_growth_phase_noise(betay, Vcc, frev, Eb, C, PSD_sum, one_sided_psd=True)
+    else:
+        return emit_growth_amplitude_noise(betay, Vcc, frev, Eb, C, PSD_sum, one_sided_psd=True)
@@ -0,0 +1,69 @@
+'''
+Auto- and cross-spectral densities, and the coherence, of simultaneous turn-by-turn signals, e.g. the
+phase and amplitude noise measured by the LLRF, or N channels.
+
+As for the PSD (cmptPSD), the signals are split in chunks of n turns and S_ij = mean(X_i * conj(X_j)),
+with X the rfft of the chunks, is accumulated block_size chunks at a time, in complex128, so the memory
+does not depend on the length of the signals (they can be np.memmap).
+'''
+import numpy as np
+from scipy import fft as sp_fft
+
+from cmptPSD import chunk_view, periodograms_to_psd
+from cmptTheoreticalEmitGrowth import emit_growth_from_measured_psd, sideband_index_map
+from noiseGenerators import precision_dtypes
+
+
+def sum_cross_periodograms(chunks, precision='double'):
+    # chunks: array (N_channels, n_chunks, n)
+    # return: sum over the chunks of X_i*conj(X_j), shape (N_channels, N_channels, n//2+1), complex128
+    real, _ = precision_dtypes(precision)
+    X = sp_fft.rfft(np.asarray(chunks, dtype=real), axis=-1)
+    return np.einsum('ikf,jkf->ijf', X, X.conj(), dtype=np.complex128)
+
+
+def averaged_csd(signals, n, frev, step=None, precision='double', block_size=256, one_sided=True):
+    '''
+    Spectral density matrix of N simultaneous signals, in one pass over the data.
+    - signals: sequence of N 1D signals of the same length (or an (N, turns) array)
+    - n: the length of each chunk in turns, step: turns between the chunks (see cmptPSD.chunk_view)
+    - frev: the revolution (sampling) frequency in Hz
+    return: freq in Hz, S of shape (N, N, len(freq)); S[i, i] is the (real) PSD of signal i and S[i, j]
+    the cross-spectral density of i and j, with the normalisation of cmptPSD.averaged_psd
+    '''
+    views = [chunk_view(np.asarray(y), n, step) for y in signals]
+    n_chunks = len(views[0])
+    if any(len(view) != n_chunks for view in views):
+        raise ValueError('All the signals must have the same length')
+
+    cross_sum = np.zeros((len(views), len(views), n // 2 + 1), dtype=np.complex128)
+    for start in range(0, n_chunks, block_size):
+        block = np.stack([view[start:start + block_size] for view in views])
+        cross_sum += sum_cross_periodograms(block, precision)
+
+    return periodograms_to_psd(cross_sum, n_chunks, n, frev, one_sided)
+
+
+def coherence(S):
+    # magnitude squared coherence, |S_ij|^2/(S_ii*S_jj), between 0 and 1, shape (N, N, len(freq))
+    auto = np.real(np.einsum('iif->if', S))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.abs(S) ** 2 / (auto[:, np.newaxis] * auto[np.newaxis, :])
+
+
+def emit_growth_from_csd(freq, S, Qy, frev, betay, Vcc, Eb, sigma_phi, pn_channel=0, an_channel=1,
+                         n_sidebands=None):
+    '''
+    Emittance growth rate from simultaneous phase (rad) and amplitude (relative) noise, from the spectral
+    density matrix of averaged_csd, summing all the betatron sidebands (see emit_growth_from_measured_psd).
+    The phase noise kicks go with cos(k*z) and the amplitude noise ones with sin(k*z) (CC_transverse_kick),
+    so the contribution of their cross-spectral density is proportional to <sin(2k*z)> and vanishes for a
+    bunch symmetric around the CC zero crossing: the total rate is the sum of the two.
+    return: rate_PN, rate_AN in m/s, each with shape (len(Qy), len(sigma_phi))
+    '''
+    index_map = sideband_index_map(freq, Qy, frev, n_sidebands)
+    rates = []
+    for channel, noise_type in ((pn_channel, 'PN'), (an_channel, 'AN')):
+        rates.append(emit_growth_from_measured_psd(freq, np.real(S[channel, channel]), Qy, frev, betay, Vcc, Eb,
+                                                   sigma_phi, noise_type=noise_type, index_map=index_map))
+    return tuple(rates)
@@ -0,0 +1,67 @@
+'''
+Chunked sampling of the longitudinal distribution, (z, delta), of a bunch, e.g. for the CC kick functions
+(CC_transverse_kick) or the tracking (linearTracking), without holding the whole bunch in memory.
+
+All the distributions are matched, i.e. rotationally symmetric in the normalised phase space
+(z/sigma_z, delta/sigma_delta), and are sampled in polar coordinates with a uniform angle theta:
+- 'gaussian': r = sqrt(-2 ln(U)) (Box-Muller)
+- 'qgaussian': r = sqrt(-2 ln_q'(U)) with q' = (1+q)/(3-q), the generalised Box-Muller method of
+  Thistleton et al., IEEE Trans. Inf. Theory 53 (2007), rescaled to unit rms. Finite rms needs q < 5/3.
+- 'pillbox': uniform in a disk of radius 2, i.e. r = 2*sqrt(U)
+
+Each chunk has its own random stream, spawned from the seed, so the bunch is reproducible chunk by chunk
+and the chunks can be generated independently.
+'''
+import numpy as np
+
+from bunchLengthConversions import bunch_length_to_m
+
+clight = 299792458
+
+distributions = ('gaussian', 'qgaussian', 'pillbox')
+
+
+def _q_log(x, q):
+    # the q-logarithm, ln_q(x) = (x^(1-q)-1)/(1-q)
+    return (x ** (1 - q) - 1) / (1 - q)
+
+
+def _sample_radius(rng, n, distribution, q):
+    U = 1 - rng.random(n)  # in (0, 1]
+    if distribution == 'gaussian':
+        return np.sqrt(-2 * np.log(U))
+    elif distribution == 'qgaussian':
+        q_prime = (1 + q) / (3 - q)
+        rms = np.sqrt((3 - q) / (5 - 3 * q))  # of r*cos(theta) for the q-Gaussian with beta = 1/(3-q)
+        return np.sqrt(-2 * _q_log(U, q_prime)) / rms
+    else:
+        return 2 * np.sqrt(U)
+
+
+def sample_bunch(n_particles, sigma_z, sigma_delta, unit='m', f_RF=400e6, distribution='gaussian', q=None,
+                 chunk_size=2**20, seed=None, dtype=np.float64):
+    '''
+    Generator of the longitudinal coordinates of a bunch of n_particles, chunk_size particles at a time.
+    - sigma_z: rms bunch length in unit, 'm', 'rad' (at f_RF in Hz) or 'ns'
+    - sigma_delta: rms momentum spread
+    - distribution: 'gaussian', 'qgaussian' (q < 5/3) or 'pillbox'
+    - dtype: np.float32 or np.float64 for the returned arrays
+    yield: z in m, delta
+    '''
+    if distribution not in distributions:
+        raise ValueError('Unknown distribution {!r}, expected one of {}'.format(distribution, distributions))
+    if distribution == 'qgaussian' and (q is None or not q < 5 / 3):
+        raise ValueError('The q-Gaussian needs q < 5/3 for a finite rms, got q = {}'.format(q))
+    if distribution == 'qgaussian' and q == 1:
+        distribution = 'gaussian'
+    sigma_z = bunch_length_to_m(sigma_z, unit, clight, f_RF)
+
+    seed_sequence = np.random.SeedSequence(seed)
+    for i, start in enumerate(range(0, n_particles, chunk_size)):
+        n = min(chunk_size, n_particles - start)
+        rng = np.random.default_rng(np.random.SeedSequence(seed_sequence.entropy, spawn_key=(i,)))
+        r = _sample_radius(rng, n, distribution, q)
+        theta = 2 * np.pi * rng.random(n)
+        z = (sigma_z * r * np.cos(theta)).astype(dtype)
+        delta = (sigma_delta * r * np.sin(theta)).astype(dtype)
+        yield z, delta
@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy.integrate import cumulative_trapezoid
+
+from NoiseConversions import ssb_2_dsb
+
+
+def load_ssb_spectrum(path):
+    # read a measured spectrum (e.g. coast3EX-10DBm.csv) with columns:
+    # Offset Frequency (Hz), Phase Noise (dBc/Hz)
+    # return: freq in Hz, L in dBc/Hz
+    data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    if data.shape[0] < 2 or data.shape[1] != 2:
+        raise ValueError('Expected two columns, frequency and L(f), in {}, got shape {}'.format(path, data.shape))
+    return data[:, 0], data[:, 1]
+
+
+def load_psd(path):
+    # return: freq in Hz, the one-sided S(f) in rad^2/Hz of a measured spectrum
+    freq, L = load_ssb_spectrum(path)
+    return freq, ssb_2_dsb(L)
+
+
+def interpolation_weights(freq, f):
+    """
+    Linear interpolation of values sampled on the increasing grid freq (at least two points) at the
+    frequencies f, for several arrays sampled on the same grid at once.
+    return: indices i, the weight w of the point i+1 (1-w for the point i) and the mask of the f inside
+    [freq[0], freq[-1]]. Outside the grid w extrapolates linearly, so it has to be combined with the mask.
+    """
+    freq = np.asarray(freq, dtype=float)
+    if len(freq) < 2:
+        raise ValueError('At least two frequencies are needed to interpolate, got {}'.format(len(freq)))
+    i = np.clip(np.searchsorted(freq, f, side='right') - 1, 0, len(freq) - 2)
+    w = (f - freq[i]) / (freq[i + 1] - freq[i])
+    inside = (f >= freq[0]) & (f <= freq[-1])
+    return i, w, inside
+
+
+# PSD(s) on a common frequency grid with the cumulative trapezoidal integral from freq[0],
+# psd and cumulative have shape (..., len(freq))
+CumulativePSD = namedtuple('CumulativePSD', ['freq', 'psd', 'cumulative'])
+
+
+def cumulative_psd(freq, psd):
+    """
+    Precompute the cumulative trapezoidal integral of a PSD, or of several PSDs with shape
+    (n_spectra, len(freq)), on its (e.g. log-spaced) frequency grid. freq must be increasing.
+    """
+    freq = np.asarray(freq, dtype=float)
+    psd = np.asarray(psd, dtype=float)
+    if np.any(np.diff(freq) <= 0):
+        raise ValueError('The frequencies of the PSD must be strictly increasing')
+    cumulative = cumulative_trapezoid(psd, freq, axis=-1, initial=0)
+    return CumulativePSD(freq, psd, cumulative)
+
+
+def _integral_up_to(cpsd, f):
+    # integral of the PSD from freq[0] to f, with the PSD linear between the grid points
+    freq = cpsd.freq
+    f = np.clip(f, freq[0], freq[-1])
+    i, w, _ = interpolation_weights(freq, f)
+    psd_i = cpsd.psd[..., i]
+    psd_f = psd_i + w * (cpsd.psd[..., i + 1] - psd_i)
+    return cpsd.cumulative[..., i] + (f - freq[i]) * (psd_i + psd_f) / 2
+
+
+def band_power(cpsd, f_lo, f_hi):
+    """
+    Integrated noise power, in rad^2 or V^2, of a CumulativePSD between f_lo and f_hi in Hz.
+    f_lo and f_hi broadcast against each other, so a list of bands is answered in one call with
+    O(log n) work per band. The bands are clipped to the measured range, there is no power outside it.
+    return: shape (n_spectra, n_bands) for several PSDs, (n_bands,) for one
+    """
+    f_lo, f_hi = np.broadcast_arrays(np.asarray(f_lo, dtype=float), np.asarray(f_hi, dtype=float))
+    if np.any(f_hi < f_lo):
+        raise ValueError('f_hi must not be lower than f_lo')
+    return _integral_up_to(cpsd, f_hi) - _integral_up_to(cpsd, f_lo)
+
+
+def total_power(cpsd):
+    # integrated noise power over the full measured range, rad^2 or V^2
+    return cpsd.cumulative[..., -1]
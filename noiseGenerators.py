@@ -0,0 +1,136 @@
+import numpy as np
+from scipy import fft as sp_fft
+
+from measuredSpectra import interpolation_weights
+
+# precision: 'double' for float64/complex128 and 'single' for float32/complex64 arrays
+_precision_dtypes = {'double': (np.float64, np.complex128),
+                     'single': (np.float32, np.complex64)}
+
+
+def precision_dtypes(precision):
+    # return: the (real, complex) numpy types for the given precision
+    try:
+        return _precision_dtypes[precision]
+    except KeyError:
+        raise ValueError("precision must be 'double' or 'single', got {!r}".format(precision))
+
+
+def create_noise_kicks(mu, A, turns, precision='double', seed=None):
+    # create sequence of white noise kicks, as they applied in the simulations
+    # A the rms amplitude, mu the mean of the normal distribution and turns the number of simulated turns
+    real, _ = precision_dtypes(precision)
+    rng = np.random.default_rng(seed)
+    kicks = rng.standard_normal(turns, dtype=real)
+    kicks *= real(A)
+    kicks += real(mu)
+    return kicks
+
+
+def create_colored_noise(N, std, phi_0=1e-8, Delta_psi=0.18, precision='double', seed=None, block_size=2**20):
+    """
+    Colored noise following A. Wolski's method: the phase psi performs a random walk around the peak of the
+    spectrum, psi_t+1 = psi_t + 2pi*Delta_psi + 2pi*ksi, with ksi normally distributed with rms std.
+    - N: number of turns, phi_0: amplitude of the noise, Delta_psi: the peak of the spectrum in tune units.
+    The phase grows as 2pi*Delta_psi*N, so the cumulative sum of the phase is always done in float64 and
+    reduced modulo 2pi. With precision='single', the ksi are drawn and the cos of the reduced phase is
+    evaluated in float32, and the returned signal is float32.
+    """
+    real, _ = precision_dtypes(precision)
+    rng = np.random.default_rng(seed)
+    y = np.empty(N, dtype=real)
+
+    psi_0 = 0.0  # phase carried from one block to the next
+    for start in range(0, N, block_size):
+        stop = min(start + block_size, N)
+        ksi = rng.standard_normal(stop - start, dtype=real)
+        dpsi = 2 * np.pi * (Delta_psi + std * ksi.astype(np.float64))
+        psi = np.cumsum(dpsi)
+        psi -= dpsi  # psi_t does not include the kick of turn t
+        psi += psi_0
+        psi_0 = np.mod(psi[-1] + dpsi[-1], 2 * np.pi)
+        np.mod(psi, 2 * np.pi, out=psi)
+        np.cos(psi.astype(real, copy=False), out=y[start:stop])
+    y *= real(phi_0)
+    return y
+
+
+def create_noise_kicks_from_psd(freq, psd, n_turns, frev, precision='double', seed=None):
+    """
+    Generate a sequence of noise kicks, one per turn, whose spectrum follows a given PSD.
+    - freq: frequencies of the PSD in Hz, psd: one-sided PSD in rad^2/Hz or V^2/Hz
+      (e.g. ssb_2_dsb of a measured L(f)), frev: revolution frequency in Hz.
+    The PSD is linearly interpolated on the FFT frequencies of the sequence, k*frev/n_turns, and no power
+    is assigned outside the measured range. Each spectral component gets a random phase, uniformly
+    distributed in [0, 2pi), and the kicks are obtained with an inverse real FFT.
+    """
+    real, cplx = precision_dtypes(precision)
+    rng = np.random.default_rng(seed)
+
+    Df = frev / n_turns
+    f_k = np.arange(n_turns // 2 + 1) * Df
+    S = np.interp(f_k, freq, psd, left=0., right=0.)
+
+    # Convert the one-sided noise power to fft amplitude, A(f(k)), such that sum(kicks**2)/N = sum(S*Df)
+    A = (n_turns * np.sqrt(S * Df / 2)).astype(real)
+    A[0] = 0  # no DC component
+
+    phases = rng.random(len(f_k), dtype=real)
+    spectrum = np.empty(len(f_k), dtype=cplx)
+    spectrum.real = np.cos(2 * np.pi * phases)
+    spectrum.imag = np.sin(2 * np.pi * phases)
+    spectrum *= A
+    return sp_fft.irfft(spectrum, n=n_turns)
+
+
+def create_correlated_noise_kicks(freq, S, n_turns, frev, path=None, precision='double', seed=None,
+                                  bin_block=2**16, workers=None):
+    """
+    Generate N correlated sequences of noise kicks, e.g. for N crab cavities driven by a shared LLRF,
+    whose spectral density matrix follows S.
+    - freq: frequencies in Hz, S: one-sided spectral density matrix of shape (N, N, len(freq)), Hermitian
+      and positive semi-definite at each frequency, e.g. the output of crossSpectra.averaged_csd
+    - path: if given, the kicks are written to this .npy file, shape (N, n_turns), and returned memory mapped
+    S is linearly interpolated on the FFT frequencies k*frev/n_turns (zero outside the measured range) and
+    Cholesky factorised, S = L L^H, for bin_block frequency bins at once. The spectrum of the kicks is
+    L z, with z independent complex gaussian numbers, and all the sequences are obtained with one batched
+    inverse real FFT along the turns, or one cavity at a time when they are written to path.
+    """
+    real, cplx = precision_dtypes(precision)
+    rng = np.random.default_rng(seed)
+    freq = np.asarray(freq, dtype=float)
+    S = np.ascontiguousarray(np.moveaxis(np.asarray(S, dtype=np.complex128), -1, 0))  # (len(freq), N, N)
+    n_cavities = S.shape[1]
+
+    Df = frev / n_turns
+    n_bins = n_turns // 2 + 1
+    spectrum = np.empty((n_cavities, n_bins), dtype=cplx)
+    for start in range(0, n_bins, bin_block):
+        f_k = np.arange(start, min(start + bin_block, n_bins)) * Df
+        # linear interpolation of all the matrix elements at once
+        i, w, inside = interpolation_weights(freq, f_k)
+        S_k = (S[i] * ((1 - w) * inside)[:, np.newaxis, np.newaxis] +
+               S[i + 1] * (w * inside)[:, np.newaxis, np.newaxis])
+
+        # normalise each bin by its mean PSD, with a small regularisation for fully coherent cavities
+        scale = np.real(np.trace(S_k, axis1=1, axis2=2)) / n_cavities
+        empty = scale <= 0
+        scale[empty] = 1
+        S_k = S_k / scale[:, np.newaxis, np.newaxis]
+        S_k += 1e-10 * np.eye(n_cavities)
+        L = np.linalg.cholesky(S_k) * np.sqrt(scale)[:, np.newaxis, np.newaxis]
+        L[empty] = 0
+
+        z = (rng.standard_normal((len(f_k), n_cavities)) + 1j * rng.standard_normal((len(f_k), n_cavities))) / np.sqrt(2)
+        # fft amplitude such that the one-sided PSD is S, as in create_noise_kicks_from_psd
+        spectrum[:, start:start + len(f_k)] = n_turns * np.sqrt(Df / 2) * np.einsum('kij,kj->ik', L, z)
+    spectrum[:, 0] = 0  # no DC component
+
+    if path is None:
+        return sp_fft.irfft(spectrum, n=n_turns, axis=-1, workers=workers)
+    # one cavity at a time, so only one sequence of kicks is held in memory besides the spectrum
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=real, shape=(n_cavities, n_turns))
+    for i in range(n_cavities):
+        out[i] = sp_fft.irfft(spectrum[i], n=n_turns, workers=workers)
+    out.flush()
+    return out
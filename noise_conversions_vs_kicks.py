@@ -0,0 +1,39 @@
+'''
+Round-trip check of the noise unit conversions (NoiseConversions.convert_noise) against the kick generator.
+
+A white one-sided PSD S in rad^2/Hz, flat over [0, frev/2], is converted to an rms kick per turn with
+convert_noise and compared to the rms of the kicks generated from the same PSD with
+create_noise_kicks_from_psd (scaled by Vcc/Eb, as in the tracking). The rms kick is converted back to
+rad^2/Hz and to dBc/Hz and compared to the starting values.
+The script fails (AssertionError) if the rms kicks differ by more than rel_tol_rms = 1e-2 (statistical
+error of n_turns kicks) or if the round trip differs by more than rel_tol_round_trip = 1e-12.
+'''
+import numpy as np
+
+from NoiseConversions import convert_noise, ssb_2_dsb
+from noiseGenerators import create_noise_kicks_from_psd
+
+frev = 43.45e3  # the revolution frequency of SPS
+Eb = 270e9  # eV
+Vcc = 1e6  # V
+n_turns = int(1e6)
+
+rel_tol_rms = 1e-2
+rel_tol_round_trip = 1e-12
+
+S = 1e-10  # rad^2/Hz, one-sided
+freq = np.array([0., frev / 2])
+kicks = create_noise_kicks_from_psd(freq, np.full(2, S), n_turns, frev, seed=1) * Vcc / Eb
+rms_generated = np.std(kicks)
+rms_converted = convert_noise(S, 'rad^2/Hz', 'rms_kick', Eb, Vcc, frev)
+print('rms kick, generated = {:.4e}, converted = {:.4e}'.format(rms_generated, rms_converted))
+assert abs(rms_generated / rms_converted - 1) < rel_tol_rms, 'rms kick of convert_noise off'
+
+S_back = convert_noise(rms_converted, 'rms_kick', 'rad^2/Hz', Eb, Vcc, frev)
+assert abs(S_back / S - 1) < rel_tol_round_trip, 'rad^2/Hz -> rms_kick -> rad^2/Hz off'
+L = np.array([-100., -120.])  # dBc/Hz
+L_back = convert_noise(convert_noise(L, 'dBc/Hz', 'rms_kick', Eb, Vcc, frev), 'rms_kick', 'dBc/Hz', Eb, Vcc, frev)
+assert np.allclose(L_back, L, rtol=rel_tol_round_trip), 'dBc/Hz -> rms_kick -> dBc/Hz off'
+assert np.allclose(convert_noise(L, 'dBc/Hz', 'rad^2/Hz'), ssb_2_dsb(L), rtol=rel_tol_round_trip)
+
+print('noise conversion checks passed')
@@ -0,0 +1,143 @@
+'''
+Plotting of long series, e.g. 1e7 turns of noise kicks or 5e6 bins of a spectrum, reduced to the screen
+resolution before drawing, so that the render time and the size of the saved figures do not depend on
+the length of the data.
+
+- minmax_decimate: min and max of each pixel column, keeps every peak (the default)
+- lttb_decimate: Largest-Triangle-Three-Buckets, keeps the visual shape with fewer points
+- log_bin: averages (or maxima) in logarithmic frequency bins, for log-frequency axes
+- plot_decimated: draws a decimated line and decimates again the visible range on zoom
+'''
+import numpy as np
+import matplotlib.pyplot as plt
+
+# Plotting parameters
+params = {'legend.fontsize': 20,
+          'figure.figsize': (9.5, 8.5),
+          'axes.labelsize': 27,
+          'axes.titlesize': 23,
+          'xtick.labelsize': 27,
+          'ytick.labelsize': 27,
+          'image.cmap': 'jet',
+          'lines.linewidth': 2,
+          'lines.markersize': 5,
+          'font.family': 'sans-serif'}
+
+
+def set_plot_style():
+    plt.rc('text', usetex=False)
+    plt.rc('font', family='serif')
+    plt.rcParams.update(params)
+
+
+def minmax_decimate(x, y, n_pixels):
+    '''
+    Keep the minimum and the maximum of y in each of n_pixels buckets of consecutive points, in their
+    original order, so that every peak of the series is drawn. x must be sorted.
+    return: x, y with at most 2*n_pixels points
+    '''
+    x, y = np.asarray(x), np.asarray(y)
+    if len(y) <= 2 * n_pixels:
+        return x, y
+    bucket = int(np.ceil(len(y) / n_pixels))
+    n_full = len(y) // bucket * bucket
+    buckets = y[:n_full].reshape(-1, bucket)
+    starts = np.arange(0, n_full, bucket)
+    i_min = starts + np.argmin(buckets, axis=1)
+    i_max = starts + np.argmax(buckets, axis=1)
+    if n_full < len(y):  # the last, shorter, bucket
+        i_min = np.append(i_min, n_full + np.argmin(y[n_full:]))
+        i_max = np.append(i_max, n_full + np.argmax(y[n_full:]))
+    indices = np.sort(np.concatenate([i_min, i_max]))
+    return x[indices], y[indices]
+
+
+def lttb_decimate(x, y, n_out):
+    '''
+    Largest-Triangle-Three-Buckets decimation (S. Steinarsson, 2013): keeps the first and last points and,
+    in each of n_out-2 buckets, the point forming the largest triangle with the point kept in the previous
+    bucket and the average of the next bucket.
+    return: x, y with n_out points
+    '''
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(y) <= n_out or n_out < 3:
+        return x, y
+    edges = np.linspace(1, len(y) - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, len(y) - 1
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_hi = edges[b + 2] if b + 2 < len(edges) else len(y)
+        x_avg, y_avg = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        x_a, y_a = x[indices[b]], y[indices[b]]
+        area = np.abs((x_a - x_avg) * (y[lo:hi] - y_a) - (x_a - x[lo:hi]) * (y_avg - y_a))
+        indices[b + 1] = lo + np.argmax(area)
+    return x[indices], y[indices]
+
+
+def log_bin(f, psd, n_bins, statistic='mean'):
+    '''
+    Reduce a spectrum to n_bins logarithmically spaced frequency bins, for a log-frequency axis.
+    - statistic: 'mean' (the average PSD of the bin), or 'max' to keep the peaks
+    Only positive frequencies are kept and the empty bins are dropped. f must be sorted.
+    return: the geometric centre of the bins in Hz, the PSD of the bins
+    '''
+    f, psd = np.asarray(f), np.asarray(psd)
+    positive = f > 0
+    f, psd = f[positive], psd[positive]
+    if len(f) <= n_bins:
+        return f, psd
+    edges = np.geomspace(f[0], f[-1], n_bins + 1)
+    starts = np.unique(np.searchsorted(f, edges[:-1], side='left'))
+    starts = starts[starts < len(f)]
+    counts = np.diff(np.append(starts, len(f)))
+    if statistic == 'mean':
+        values = np.add.reduceat(psd, starts) / counts
+    elif statistic == 'max':
+        values = np.maximum.reduceat(psd, starts)
+    else:
+        raise ValueError("statistic must be 'mean' or 'max', got {!r}".format(statistic))
+    centres = np.sqrt(f[starts] * f[starts + counts - 1])
+    return centres, values
+
+
+_decimation_methods = {'minmax': lambda x, y, n: minmax_decimate(x, y, n),
+                       'lttb': lambda x, y, n: lttb_decimate(x, y, 2 * n)}
+
+
+def plot_decimated(ax, x, y, n_pixels=None, method='minmax', **kwargs):
+    '''
+    Plot y(x) on ax reduced to the resolution of the axes, and decimate again the visible range when the
+    x limits change (zoom or pan), from the full data kept in memory.
+    - n_pixels: number of buckets, by default the width of the axes in pixels
+    - method: 'minmax' or 'lttb'
+    - kwargs: passed to ax.plot
+    return: the Line2D
+    '''
+    x, y = np.asarray(x), np.asarray(y)
+    try:
+        decimate = _decimation_methods[method]
+    except KeyError:
+        raise ValueError('method must be one of {}, got {!r}'.format(list(_decimation_methods), method))
+    if n_pixels is None:
+        n_pixels = max(int(ax.get_window_extent().width), 100)
+
+    line, = ax.plot(*decimate(x, y, n_pixels), **kwargs)
+    ax.set_xlim(x[0], x[-1])
+
+    def redecimate(ax):
+        x_min, x_max = sorted(ax.get_xlim())
+        lo = max(np.searchsorted(x, x_min, side='left') - 1, 0)
+        hi = min(np.searchsorted(x, x_max, side='right') + 1, len(x))
+        line.set_data(*decimate(x[lo:hi], y[lo:hi], n_pixels))
+
+    ax.callbacks.connect('xlim_changed', redecimate)
+    return line
+
+
+def plot_log_spectrum(ax, f, psd, n_bins=1000, statistic='mean', **kwargs):
+    # plot a spectrum on log-log axes, reduced to n_bins logarithmic bins (see log_bin)
+    line, = ax.plot(*log_bin(f, psd, n_bins, statistic), **kwargs)
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    return line
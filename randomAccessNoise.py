@@ -0,0 +1,124 @@
+'''
+Random access generation of one logical sequence of noise kicks: any segment of turns [start, stop) of
+the sequence defined by a seed can be generated on its own, e.g. on different batch nodes, and the
+concatenation of the segments is bit-identical to the serial generation of the whole sequence.
+
+The turns are split in blocks of block_turns and each block draws its numbers from its own counter based
+Philox stream, keyed by (seed, stream, block) through np.random.SeedSequence(seed, spawn_key=...), so a
+block is generated without drawing the numbers of the previous ones. A segment generates the blocks it
+overlaps and keeps the requested turns. The sequences are identical for a given seed and block_turns on
+the same software stack; they are not the ones of noiseGenerators, which draw sequentially.
+'''
+import numpy as np
+from scipy import fft as sp_fft
+from scipy.signal import oaconvolve
+
+from measuredSpectra import cumulative_psd, band_power
+
+block_turns_default = 2**16
+
+# independent streams of the same seed
+_WHITE, _BLOCK_SUMS, _BLOCK_DRAWS = 0, 1, 2
+
+
+def _block_rng(seed, stream, block=None):
+    spawn_key = (stream,) if block is None else (stream, block)
+    return np.random.Generator(np.random.Philox(np.random.SeedSequence(seed, spawn_key=spawn_key)))
+
+
+def _check_segment(seed, start, stop):
+    if not isinstance(seed, (int, np.integer)):
+        raise ValueError('An integer seed is needed to generate the same sequence everywhere, got {!r}'.format(seed))
+    if not 0 <= start <= stop:
+        raise ValueError('Invalid segment of turns [{}, {})'.format(start, stop))
+
+
+def _concatenate_blocks(generate_block, start, stop, block_turns):
+    # generate the blocks overlapping [start, stop) and keep the requested turns
+    if start == stop:
+        return np.empty(0)
+    first, last = start // block_turns, (stop - 1) // block_turns
+    blocks = np.concatenate([generate_block(b) for b in range(first, last + 1)])
+    offset = first * block_turns
+    return blocks[start - offset:stop - offset]
+
+
+def noise_kicks_segment(seed, start, stop, mu=0., A=1., block_turns=block_turns_default):
+    # turns [start, stop) of the sequence of white noise kicks with mean mu and rms A (create_noise_kicks)
+    _check_segment(seed, start, stop)
+    white = _concatenate_blocks(lambda b: _block_rng(seed, _WHITE, b).standard_normal(block_turns),
+                                start, stop, block_turns)
+    return mu + A * white
+
+
+def colored_noise_segment(seed, start, stop, std, phi_0=1e-8, Delta_psi=0.18, block_turns=block_turns_default):
+    '''
+    Turns [start, stop) of the colored noise of A. Wolski's method (noiseGenerators.create_colored_noise),
+    psi_t+1 = psi_t + 2pi*Delta_psi + 2pi*ksi_t, with ksi_t normally distributed with rms std.
+    The phase carried to the start of block b needs the sum of all the previous ksi. So the sum of each
+    block, S_b ~ N(0, block_turns*std^2), is drawn first from one sequential stream (a single number per
+    block), and the ksi of the block are drawn conditioned on it: ksi = eps - mean(eps) + S_b/block_turns,
+    with eps normal. These ksi are independent normal numbers, as in the sequential generation.
+    '''
+    _check_segment(seed, start, stop)
+    if start == stop:
+        return np.empty(0)
+    last = (stop - 1) // block_turns
+    # sums of the ksi (in units of std) of the blocks, the same first numbers whatever the segment
+    block_sums = _block_rng(seed, _BLOCK_SUMS).standard_normal(last + 1) * np.sqrt(block_turns)
+    carried_sums = np.concatenate([[0.], np.cumsum(block_sums)[:-1]])
+
+    def generate_block(b):
+        eps = _block_rng(seed, _BLOCK_DRAWS, b).standard_normal(block_turns)
+        ksi = std * (eps - np.mean(eps) + block_sums[b] / block_turns)
+        # phase at the start of the block in units of 2pi, reduced modulo 1
+        psi_0 = np.mod(np.mod(Delta_psi * b * block_turns, 1.) + np.mod(std * carried_sums[b], 1.), 1.)
+        dpsi = Delta_psi + ksi
+        psi = np.cumsum(dpsi)
+        psi -= dpsi  # psi_t does not include the kick of turn t
+        return phi_0 * np.cos(2 * np.pi * (psi_0 + psi))
+
+    return _concatenate_blocks(generate_block, start, stop, block_turns)
+
+
+def design_noise_filter(freq, psd, frev, n_taps=4095):
+    '''
+    FIR filter that turns white noise of unit rms, one number per turn, into noise with the one-sided PSD
+    psd (rad^2/Hz or V^2/Hz) given at the frequencies freq in Hz (zero outside that range).
+    The zero phase response sqrt(psd*frev/2) is sampled on the n_taps FFT frequencies, centred and
+    tapered with a Hann window, so the spectral resolution is about frev/n_taps: features of the PSD
+    narrower than a few frev/n_taps, e.g. lines, are broadened, and lost if they fall between the samples.
+    The taper removes power from such features, so the taps are rescaled to keep the variance of the
+    noise, sum(h**2), equal to the integral of psd up to frev/2. Choose n_taps above about
+    2*frev/(narrowest width) for the shape of the lines to be kept too.
+    return: the filter taps
+    '''
+    f_k = sp_fft.rfftfreq(n_taps, 1 / frev)
+    H = np.sqrt(np.interp(f_k, freq, psd, left=0., right=0.) * frev / 2)
+    H[0] = 0  # no DC component
+    h = np.fft.fftshift(sp_fft.irfft(H, n=n_taps))
+    h *= np.hanning(n_taps + 2)[1:-1]
+
+    power = band_power(cumulative_psd(freq, psd), 0., frev / 2)
+    h_power = np.sum(h ** 2)
+    if h_power > 0:
+        h *= np.sqrt(power / h_power)
+    return h
+
+
+def filtered_noise_segment(seed, start, stop, h, block_turns=block_turns_default):
+    '''
+    Turns [start, stop) of the noise of the spectrum given by the filter h (design_noise_filter):
+    y_t = sum_m h_m w_(t+m), with w the white noise sequence noise_kicks_segment of the same seed.
+    Each block of output is computed from the same white noise segment whatever the requested turns.
+    '''
+    _check_segment(seed, start, stop)
+    n_taps = len(h)
+    h_reversed = np.asarray(h, dtype=float)[::-1]
+
+    def generate_block(b):
+        white = noise_kicks_segment(seed, b * block_turns, (b + 1) * block_turns + n_taps - 1,
+                                    block_turns=block_turns)
+        return oaconvolve(white, h_reversed, mode='valid')
+
+    return _concatenate_blocks(generate_block, start, stop, block_turns)
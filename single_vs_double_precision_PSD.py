@@ -0,0 +1,57 @@
+'''
+Accuracy check of the single precision (float32/complex64) path against the double precision one.
+
+1) Colored noise (A. Wolski's method) of n_chunks*n turns is generated in float64 and the averaged PSD
+   is computed with precision='double' and precision='single' from the same signal.
+2) Noise kicks are generated from the PSD with both precisions and their rms is compared to the
+   integrated PSD.
+
+For phase noise at the 1e-8 rad level the relative difference of the averaged PSDs is expected below the
+1e-6 level (float32 resolution), far below the statistical error of the average, 1/sqrt(n_chunks).
+The script fails (AssertionError) if:
+- the relative difference of the PSDs exceeds rel_tol_psd = 1e-5,
+- the rms of the kicks of either precision differs from sqrt(total power) by more than rel_tol_rms = 1e-3,
+- the colored noise generated in single precision is not float32 or its rms differs from phi_0/sqrt(2)
+  by more than rel_tol_noise = 1e-2 (the ksi are drawn in float32, so it is a different realisation
+  than the double precision one and only its statistics are compared).
+'''
+import numpy as np
+
+from noiseGenerators import create_colored_noise, create_noise_kicks_from_psd
+from cmptPSD import averaged_psd
+
+n_chunks = int(1e3)
+n = 1000  # how many elements in each chunk should have
+frev = 43.45e3  # the revolution frequency of SPS
+
+rel_tol_psd = 1e-5
+rel_tol_rms = 1e-3
+rel_tol_noise = 1e-2
+
+y = create_colored_noise(n_chunks * n, std=0.08, seed=1)
+
+freq, PSD_double = averaged_psd(y, n, frev, precision='double')
+freq, PSD_single = averaged_psd(y, n, frev, precision='single')
+
+mask = PSD_double > 1e-6 * PSD_double.max()  # ignore the components without power
+rel_diff = np.max(np.abs(PSD_single[mask] - PSD_double[mask]) / PSD_double[mask])
+print('max relative difference of the PSD, single vs double: {:.2e}'.format(rel_diff))
+print('statistical error of the averaged PSD: {:.2e}'.format(1 / np.sqrt(n_chunks)))
+assert rel_diff < rel_tol_psd, 'single precision PSD off by {:.2e}'.format(rel_diff)
+
+y_single = create_colored_noise(n_chunks * n, std=0.08, precision='single', seed=1)
+noise_diff = abs(np.std(y_single, dtype=np.float64) / (1e-8 / np.sqrt(2)) - 1)
+print('relative difference of the rms of the single precision colored noise: {:.2e}'.format(noise_diff))
+assert y_single.dtype == np.float32
+assert noise_diff < rel_tol_noise, 'single precision colored noise rms off by {:.2e}'.format(noise_diff)
+
+# Parseval: the variance of the kicks is the integral of the one-sided PSD
+total_power = np.sum(PSD_double) * (freq[1] - freq[0])
+for precision in ['double', 'single']:
+    kicks = create_noise_kicks_from_psd(freq, PSD_double, int(1e6), frev, precision=precision, seed=2)
+    rms = np.std(kicks, dtype=np.float64)
+    print('{}: dtype={}, rms kick = {:.4e}, sqrt(total power) = {:.4e}'.format(
+        precision, kicks.dtype, rms, np.sqrt(total_power)))
+    assert abs(rms / np.sqrt(total_power) - 1) < rel_tol_rms, '{} precision kicks rms off'.format(precision)
+
+print('single precision accuracy checks passed')
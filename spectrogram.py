@@ -0,0 +1,171 @@
+'''
+Streaming short-time spectrum (spectrogram) of long turn-by-turn signals, e.g. noise kicks or BPM data.
+
+The signal is appended piece by piece. As in the chunk analysis of the PSD (cmptPSD), it is split in
+chunks of n turns, and every chunks_per_column chunks the averaged PSD is written as one column (a row
+of the file) of a memory mapped .npy spectrogram, so only one column is ever held in memory.
+
+The parameters and the number of written columns are kept in a .json file next to the spectrogram
+(path + '.json'), updated with every column, so that a spectrogram written by another process can be
+reopened read-only with StreamingSpectrogram.open and queried without recomputing any FFT.
+'''
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from cmptPSD import chunk_view, sum_periodograms, periodograms_to_psd
+from noiseGenerators import precision_dtypes
+
+
+def _bin_counts(n_bins, factor):
+    # the number of bins in each group of factor adjacent frequency bins, the last group may be shorter
+    starts = np.arange(0, n_bins, factor)
+    return starts, np.diff(np.append(starts, n_bins))
+
+
+def _decimate_frequency(values, factor, axis=-1):
+    # average groups of factor adjacent frequency bins
+    starts, counts = _bin_counts(values.shape[axis], factor)
+    shape = [1] * values.ndim
+    shape[axis] = len(counts)
+    return np.add.reduceat(values, starts, axis=axis) / counts.reshape(shape)
+
+
+class StreamingSpectrogram:
+    '''
+    - path: the .npy file of the spectrogram, of shape (max_columns, n_freq), created or overwritten
+    - n: the length of each chunk in turns, frev: the revolution (sampling) frequency in Hz
+    - chunks_per_column: how many chunks are averaged in each column
+    - freq_decimation: average this many adjacent frequency bins before writing
+    - precision: 'double' or 'single' FFTs, see cmptPSD.averaged_psd
+    '''
+
+    def __init__(self, path, n, frev, chunks_per_column, max_columns, freq_decimation=1, precision='double',
+                 one_sided=True):
+        # validate everything before the file is created or overwritten
+        for name, value in [('n', n), ('chunks_per_column', chunks_per_column), ('max_columns', max_columns),
+                            ('freq_decimation', freq_decimation)]:
+            if int(value) != value or value < 1:
+                raise ValueError('{} must be a positive integer, got {!r}'.format(name, value))
+        if not frev > 0:
+            raise ValueError('frev must be positive, got {!r}'.format(frev))
+        precision_dtypes(precision)
+        self.path = path
+        # plain python types, also for numpy scalars, so that the metadata can be written to json
+        self.n = int(n)
+        self.frev = float(frev)
+        self.chunks_per_column = int(chunks_per_column)
+        self.freq_decimation = int(freq_decimation)
+        self.precision = precision
+        self.one_sided = bool(one_sided)
+        max_columns = int(max_columns)
+        self._set_frequencies()
+        self.data = open_memmap(path, mode='w+', dtype=np.float64, shape=(max_columns, len(self.freq)))
+        self.n_columns = 0
+        self.read_only = False
+        self._write_metadata()
+
+        self._leftover = np.empty(0)  # turns that do not fill a chunk yet
+        self._periodogram_sum = np.zeros(self.n // 2 + 1)
+        self._n_chunks = 0
+
+    @classmethod
+    def open(cls, path):
+        # reopen, read-only, a spectrogram written by StreamingSpectrogram, with its path + '.json' metadata
+        with open(path + '.json') as f:
+            metadata = json.load(f)
+        self = cls.__new__(cls)
+        self.path = path
+        for name in ('n', 'frev', 'chunks_per_column', 'freq_decimation', 'precision', 'one_sided', 'n_columns'):
+            setattr(self, name, metadata[name])
+        self._set_frequencies()
+        self.data = np.load(path, mmap_mode='r')
+        self.read_only = True
+        return self
+
+    def _set_frequencies(self):
+        freq = np.fft.rfftfreq(self.n, 1 / self.frev)
+        self.freq = _decimate_frequency(freq, self.freq_decimation)
+        self.bin_width = _bin_counts(len(freq), self.freq_decimation)[1] * self.frev / self.n  # Hz
+
+    def _write_metadata(self):
+        metadata = {'n': int(self.n), 'frev': float(self.frev), 'chunks_per_column': int(self.chunks_per_column),
+                    'freq_decimation': int(self.freq_decimation), 'precision': str(self.precision),
+                    'one_sided': bool(self.one_sided), 'n_columns': int(self.n_columns),
+                    'max_columns': int(len(self.data))}
+        tmp = self.path + '.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(metadata, f)
+        os.replace(tmp, self.path + '.json')
+
+    def append(self, y):
+        # append the next turns of the signal, a column is written every chunks_per_column chunks
+        if self.read_only:
+            raise ValueError('The spectrogram {} is opened read-only'.format(self.path))
+        y = np.concatenate([self._leftover, np.asarray(y, dtype=np.float64)])
+        n_full = len(y) // self.n * self.n
+        self._leftover = y[n_full:].copy()
+        if n_full == 0:
+            return
+        chunks = chunk_view(y[:n_full], self.n)
+
+        start = 0
+        while start < len(chunks):
+            stop = min(start + self.chunks_per_column - self._n_chunks, len(chunks))
+            self._periodogram_sum += sum_periodograms(chunks[start:stop], self.precision)
+            self._n_chunks += stop - start
+            start = stop
+            if self._n_chunks == self.chunks_per_column:
+                self._write_column()
+
+    def _write_column(self):
+        if self.n_columns == len(self.data):
+            raise ValueError('The spectrogram is full, max_columns = {}'.format(len(self.data)))
+        _, PSD = periodograms_to_psd(self._periodogram_sum, self._n_chunks, self.n, self.frev, self.one_sided)
+        self.data[self.n_columns] = _decimate_frequency(PSD, self.freq_decimation)
+        self.data.flush()
+        self.n_columns += 1
+        self._write_metadata()
+        self._periodogram_sum[:] = 0
+        self._n_chunks = 0
+
+    @property
+    def psd(self):
+        # the filled part of the spectrogram, (n_columns, n_freq) in rad^2/Hz or V^2/Hz
+        return self.data[:self.n_columns]
+
+    def times(self):
+        # the time in s at the middle of each column
+        turns_per_column = self.n * self.chunks_per_column
+        return (np.arange(self.n_columns) + 0.5) * turns_per_column / self.frev
+
+    def decimate(self, time_factor=1, freq_factor=1):
+        '''
+        Coarser spectrogram, averaging time_factor columns and freq_factor frequency bins,
+        computed from the stored columns without any FFT.
+        return: times in s, freq in Hz, PSD of shape (n_columns // time_factor, n_freq / freq_factor)
+        '''
+        n_columns = self.n_columns // time_factor * time_factor
+        PSD = self.data[:n_columns].reshape(-1, time_factor, self.data.shape[1]).mean(axis=1)
+        times = self.times()[:n_columns].reshape(-1, time_factor).mean(axis=1)
+        return times, _decimate_frequency(self.freq, freq_factor), _decimate_frequency(PSD, freq_factor)
+
+    def band_power_vs_time(self, f_lo, f_hi, block_size=1024):
+        '''
+        Noise power, in rad^2 or V^2, in the bands [f_lo, f_hi] in Hz, for each column, from the stored
+        PSD. The bins whose centre is within a band are summed. f_lo, f_hi broadcast to a list of bands.
+        return: array of shape (n_columns,) + shape of the bands
+        '''
+        f_lo, f_hi = np.broadcast_arrays(np.asarray(f_lo, dtype=float), np.asarray(f_hi, dtype=float))
+        i_lo = np.searchsorted(self.freq, f_lo, side='left')
+        i_hi = np.searchsorted(self.freq, f_hi, side='right')
+
+        power = np.empty((self.n_columns,) + f_lo.shape)
+        for start in range(0, self.n_columns, block_size):
+            block = self.data[start:min(start + block_size, self.n_columns)]
+            cumulative = np.zeros((len(block), block.shape[1] + 1))
+            np.cumsum(block * self.bin_width, axis=1, out=cumulative[:, 1:])
+            power[start:start + len(block)] = cumulative[:, i_hi] - cumulative[:, i_lo]
+        return power